@@ -1,14 +1,25 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field, conint, confloat
 import pandas as pd
 import numpy as np
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime, timedelta
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from datetime import date, datetime, timedelta
 import random
 import os
+import sqlite3
+import threading
+import time
 from twilio.rest import Client
 from twilio.twiml.voice_response import VoiceResponse
 from dotenv import load_dotenv
+from backend.allocation import BedAllocator
+from backend.inventory import InventoryStore, forecast_is_stale, project_usage, reorder_plan, batch_orders, order_email_body, records as inventory_records
+from backend.geo import HospitalIndex, DEFAULT_HOSPITALS
+from backend.admission import AdmissionController, RateLimited, Overloaded
+from backend.columnar import MSGPACK_MEDIA_TYPE, wants_msgpack, dataframe_to_msgpack
 
 load_dotenv(override=True)
 
@@ -42,6 +53,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(RequestValidationError)
+def validation_error(request: Request, exc: RequestValidationError):
+    # Leave the rejected input out of the 422: a NaN or inf in it would not serialise
+    errors = [{k: v for k, v in e.items() if k != "input"} for e in exc.errors()]
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(errors)})
+
 # Load historical data
 # Adjusted path logic for api/index.py location
 # __file__ is .../api/index.py
@@ -55,12 +72,22 @@ except Exception as e:
     print(f"Warning: Could not load CSV from {csv_path}: {e}")
     df = pd.DataFrame() # Fallback empty DF
 
+# Inventory store (SQLite) for stock levels, forecast and restock orders
+# Vercel only allows writes under /tmp, which is per instance and lost on a
+# cold start, so scheduled restock batching runs on the local server only
+inventory_db_path = os.getenv("INVENTORY_DB_PATH", '/tmp/inventory.db' if os.getenv("VERCEL") else os.path.join(current_dir, 'inventory.db'))
+inventory_store = InventoryStore(inventory_db_path)
+
+# Spatial index for /hospitals/nearby; occupancy is refreshed in place
+hospital_index = HospitalIndex(DEFAULT_HOSPITALS)
+
 class PredictionRequest(BaseModel):
     date: str # YYYY-MM-DD
     aqi: float
     temp: float
     humidity: float
     is_festival: int
+    hospital_id: str | None = None # refresh this hospital's occupancy in /hospitals/nearby
 
 @app.get("/")
 def read_root():
@@ -116,10 +143,37 @@ class HealthSurgeLSTM:
 # Initialize Model
 lstm_model = HealthSurgeLSTM()
 
+# Admission control for /predict: per-client rate limits, coalescing of
+# identical requests and load shedding once inference exceeds its budget
+inference_admission = AdmissionController(
+    rate=float(os.getenv("PREDICT_RATE_PER_SEC", "5")),
+    burst=int(os.getenv("PREDICT_BURST", "10")),
+    max_inflight=int(os.getenv("INFERENCE_MAX_INFLIGHT", "4")),
+    max_queue=int(os.getenv("INFERENCE_MAX_QUEUE", "16")),
+    latency_budget_ms=float(os.getenv("INFERENCE_LATENCY_BUDGET_MS", "250"))
+)
+
 @app.post("/predict")
-def predict(request: PredictionRequest):
-    print(f"DEBUG: Inference Request - AQI: {request.aqi}, Temp: {request.temp}")
-    
+def predict(request: PredictionRequest, http_request: Request):
+    # Rate limit by client address. On Vercel the app sits behind the edge
+    # proxy, which sets x-real-ip itself and overwrites any client-sent value
+    if os.getenv("VERCEL") and http_request.headers.get("x-real-ip"):
+        client = http_request.headers["x-real-ip"]
+    else:
+        client = http_request.client.host if http_request.client else "unknown"
+    key = tuple(sorted(request.__dict__.items()))
+    try:
+        return inference_admission.run(client, key, lambda: run_prediction(request))
+    except RateLimited:
+        raise HTTPException(status_code=429, detail="Too many prediction requests.", headers={"Retry-After": "1"})
+    except Overloaded:
+        raise HTTPException(status_code=503, detail="Inference is overloaded, retry shortly.", headers={"Retry-After": "2"})
+
+@app.get("/admission")
+def get_admission_stats():
+    return inference_admission.snapshot()
+
+def run_prediction(request: PredictionRequest):
     # Run Inference
     predicted_patients = lstm_model.predict({
         'aqi': request.aqi,
@@ -160,6 +214,9 @@ def predict(request: PredictionRequest):
         reasons.append("Model Inference: All parameters within nominal range. No anomalies detected.")
         actions.append("Maintain standard operating procedure.")
 
+    if request.hospital_id:
+        hospital_index.update_occupancy({request.hospital_id: round(predicted_beds, 1)})
+
     return {
         "predicted_patients": predicted_patients,
         "predicted_bed_occupancy": round(predicted_beds, 1),
@@ -167,6 +224,105 @@ def predict(request: PredictionRequest):
         "actions": actions
     }
 
+# --- Nearby Hospitals ---
+class HospitalLocation(BaseModel):
+    id: str
+    name: str
+    address: str = ""
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+    beds: int = Field(ge=0)
+    occupancy: float | None = Field(None, ge=0, le=100) # omit to keep a known hospital's live value
+
+class HospitalRegistration(BaseModel):
+    hospitals: list[HospitalLocation]
+
+class OccupancyUpdate(BaseModel):
+    occupancy: dict[str, float] # hospital id -> predicted occupancy %
+
+@app.get("/hospitals/nearby")
+def get_nearby_hospitals(
+    lat: float = Query(ge=-90, le=90),
+    lon: float = Query(ge=-180, le=180),
+    k: int = Query(5, ge=1, le=50),
+    min_beds: int = Query(1, ge=0),
+    max_km: float | None = Query(None, gt=0)
+):
+    start = time.perf_counter()
+    results = hospital_index.nearby(lat, lon, k=k, min_beds=min_beds, max_km=max_km)
+    return {
+        "hospitals": results,
+        "query_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+@app.post("/hospitals")
+def register_hospitals(request: HospitalRegistration):
+    try:
+        hospital_index.add([h.model_dump(exclude_unset=True) for h in request.hospitals])
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "total": len(hospital_index)}
+
+@app.post("/hospitals/occupancy")
+def update_hospital_occupancy(request: OccupancyUpdate):
+    unknown = hospital_index.update_occupancy(request.occupancy)
+    return {"status": "success", "updated": len(request.occupancy) - len(unknown), "unknown": unknown}
+
+# --- Bed Allocation ---
+# Latest plan is kept in memory so ward updates can be re-solved incrementally;
+# the lock serialises handlers since the solver mutates it in place
+bed_allocator = None
+allocation_lock = threading.Lock()
+
+class WardInventory(BaseModel):
+    ward_id: str
+    department: str
+    beds: int = Field(ge=0)
+
+class AllocationRequest(BaseModel):
+    wards: list[WardInventory]
+    forecast: list[conint(ge=0)] # predicted patients per day
+    department_mix: dict[str, confloat(ge=0)] # department -> weight, normalised
+
+class AllocationUpdate(BaseModel):
+    beds: dict[str, conint(ge=0)] = {}
+    department_mix: dict[str, confloat(ge=0)] = {}
+
+@app.post("/allocation/plan")
+def create_allocation_plan(request: AllocationRequest):
+    global bed_allocator
+    try:
+        wards = [
+            {"ward_id": w.ward_id, "department": w.department, "beds": w.beds}
+            for w in request.wards
+        ]
+        allocator = BedAllocator(wards, request.forecast, request.department_mix)
+        with allocation_lock:
+            bed_allocator = allocator
+            return {"status": "success", "plan": bed_allocator.plan()}
+    except Exception as e:
+        print(f"Allocation Error: {e}")
+        return {"status": "error", "message": str(e)}
+
+@app.post("/allocation/update")
+def update_allocation_plan(request: AllocationUpdate):
+    with allocation_lock:
+        if bed_allocator is None:
+            return {"status": "error", "message": "No allocation plan yet. Create one via /allocation/plan."}
+        try:
+            bed_allocator.update(request.beds, request.department_mix)
+            return {"status": "success", "plan": bed_allocator.plan()}
+        except Exception as e:
+            print(f"Allocation Error: {e}")
+            return {"status": "error", "message": str(e)}
+
+@app.get("/allocation/plan")
+def get_allocation_plan():
+    with allocation_lock:
+        if bed_allocator is None:
+            return {"status": "error", "message": "No allocation plan yet. Create one via /allocation/plan."}
+        return {"status": "success", "plan": bed_allocator.plan()}
+
 class EmergencyActionRequest(BaseModel):
     actions: list[str]
 
@@ -335,11 +491,16 @@ def delete_contact(contact_id: int):
     return {"status": "success", "contacts": emergency_contacts}
 
 @app.get("/historical")
-def get_historical():
-    # Return last 100 days for charting
+def get_historical(request: Request, response: Response, limit: int = 100):
+    # Return last 100 days for charting (limit=0 for the full history)
+    # The body depends on Accept, so caches must key on it
+    response.headers["Vary"] = "Accept"
     if df.empty:
         return []
-    data = df.tail(100).to_dict(orient='records')
+    rows = df if limit <= 0 else df.tail(limit)
+    if wants_msgpack(request.headers.get("accept")):
+        return Response(content=dataframe_to_msgpack(rows), media_type=MSGPACK_MEDIA_TYPE, headers={"Vary": "Accept"})
+    data = rows.to_dict(orient='records')
     return data
 
 class RestockEmailRequest(BaseModel):
@@ -351,38 +512,181 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-@app.post("/send_restock_email")
-def send_restock_email(request: RestockEmailRequest):
+def send_emails(messages, on_sent=None):
+    """
+    Send (to, subject, body) messages over a single SMTP session.
+    on_sent(i) runs right after message i goes out, so callers can record
+    each send even if a later one fails.
+    """
     email_user = os.getenv("EMAIL_USER")
     email_password = os.getenv("EMAIL_PASSWORD")
 
     if not email_user or not email_password:
-        print("Error: EMAIL_USER or EMAIL_PASSWORD not set in .env")
-        return {"status": "error", "message": "Backend email credentials not configured."}
+        raise ValueError("Backend email credentials not configured.")
+
+    # SMTP Configuration for Gmail
+    smtp_server = "smtp.gmail.com"
+    smtp_port = 587
 
+    server = smtplib.SMTP(smtp_server, smtp_port)
+    server.starttls()
+    server.login(email_user, email_password)
     try:
-        # SMTP Configuration for Gmail
-        smtp_server = "smtp.gmail.com"
-        smtp_port = 587
+        for i, (to, subject, body) in enumerate(messages):
+            msg = MIMEMultipart()
+            msg['From'] = email_user
+            msg['To'] = to
+            msg['Subject'] = subject
+            msg.attach(MIMEText(body, 'plain'))
+            server.sendmail(email_user, to, msg.as_string())
+            print(f"Email sent successfully to {to}")
+            if on_sent:
+                on_sent(i)
+    finally:
+        server.quit()
 
-        msg = MIMEMultipart()
-        msg['From'] = email_user
-        msg['To'] = request.vendor_email
-        msg['Subject'] = f"URGENT: Restock Request for {request.item_name}"
+@app.post("/send_restock_email")
+def send_restock_email(request: RestockEmailRequest):
+    if not os.getenv("EMAIL_USER") or not os.getenv("EMAIL_PASSWORD"):
+        print("Error: EMAIL_USER or EMAIL_PASSWORD not set in .env")
+        return {"status": "error", "message": "Backend email credentials not configured."}
 
+    try:
         body = f"Please supply {request.quantity} units of {request.item_name} immediately to HealthSurge Hospital."
-        msg.attach(MIMEText(body, 'plain'))
-
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(email_user, email_password)
-        text = msg.as_string()
-        server.sendmail(email_user, request.vendor_email, text)
-        server.quit()
-
-        print(f"Email sent successfully to {request.vendor_email}")
+        send_emails([(request.vendor_email, f"URGENT: Restock Request for {request.item_name}", body)])
         return {"status": "success", "message": f"Email sent to {request.vendor_email}"}
 
     except Exception as e:
         print(f"Failed to send email: {e}")
         return {"status": "error", "message": str(e)}
+
+# --- Inventory Forecasting & Batched Restock ---
+class InventoryItemUpdate(BaseModel):
+    # Only sku is needed to update a known item; new SKUs need the full row
+    sku: str
+    name: str | None = None
+    category: str | None = None
+    vendor: str | None = None
+    vendor_email: str | None = None
+    on_hand: float | None = Field(None, ge=0)
+    on_order: float | None = Field(None, ge=0)
+    per_100_patients: float | None = Field(None, ge=0)
+    heat_factor: float | None = Field(None, ge=0)
+    smog_factor: float | None = Field(None, ge=0)
+    lead_time_days: int | None = Field(None, ge=0)
+    pack_size: int | None = Field(None, ge=1)
+
+class InventoryStockRequest(BaseModel):
+    items: list[InventoryItemUpdate]
+
+class ForecastDay(BaseModel):
+    predicted_patients: float = Field(ge=0)
+    aqi: float = Field(ge=0)
+    temp: float = Field(allow_inf_nan=False)
+
+class InventoryForecastRequest(BaseModel):
+    days: list[ForecastDay]
+    start_date: date | None = None # date of the first day, defaults to today
+
+# Serialises plan -> send -> record so overlapping batches cannot order twice
+restock_lock = threading.Lock()
+
+def current_restock_plan(forecast=None):
+    if forecast is None:
+        forecast = inventory_store.load_forecast()
+    if forecast.empty:
+        raise ValueError("No patient forecast stored. Post one to /inventory/forecast.")
+    items = inventory_store.items()
+    return reorder_plan(items, project_usage(items, forecast))
+
+@app.get("/inventory")
+def get_inventory(request: Request, response: Response):
+    response.headers["Vary"] = "Accept"
+    try:
+        items = current_restock_plan()
+    except ValueError:
+        # No forecast yet: plain stock levels
+        items = inventory_store.items()
+    if wants_msgpack(request.headers.get("accept")):
+        return Response(content=dataframe_to_msgpack(items), media_type=MSGPACK_MEDIA_TYPE, headers={"Vary": "Accept"})
+    return {"status": "success", "items": inventory_records(items)}
+
+@app.post("/inventory/stock")
+def update_inventory_stock(request: InventoryStockRequest):
+    try:
+        inventory_store.upsert_items([item.__dict__ for item in request.items])
+    except (ValueError, sqlite3.IntegrityError) as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "updated": len(request.items)}
+
+@app.post("/inventory/forecast")
+def update_inventory_forecast(request: InventoryForecastRequest):
+    if not request.days:
+        return {"status": "error", "message": "Forecast must contain at least one day."}
+    try:
+        inventory_store.save_forecast([day.__dict__ for day in request.days], request.start_date or date.today())
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "items": inventory_records(current_restock_plan())}
+
+@app.get("/inventory/restock_batch")
+def preview_restock_batch():
+    """Orders the next batch would send, one per vendor. Sends nothing."""
+    try:
+        forecast = inventory_store.load_forecast()
+        orders = batch_orders(current_restock_plan(forecast))
+        return {
+            "status": "success",
+            "sent": False,
+            "forecast_start": forecast["date"].iloc[0],
+            "forecast_stale": forecast_is_stale(forecast),
+            "orders": orders
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def restock_batch(skip_stale=False):
+    """Coalesce every item due for reorder into one email per vendor."""
+    orders = []
+    recorded = []
+
+    def record(i):
+        # Record each order the moment its email is out, so a later SMTP
+        # failure cannot make the next run order it again
+        inventory_store.record_orders([orders[i]])
+        recorded.append(orders[i])
+
+    with restock_lock:
+        try:
+            forecast = inventory_store.load_forecast()
+            if skip_stale and not forecast.empty and forecast_is_stale(forecast):
+                message = f"Forecast starting {forecast['date'].iloc[0]} is stale. Post a new one to /inventory/forecast."
+                print(f"Restock batch skipped: {message}")
+                return {"status": "skipped", "message": message, "orders": []}
+            orders = batch_orders(current_restock_plan(forecast))
+            if orders:
+                send_emails([
+                    (o["vendor_email"], f"HealthSurge Restock Order: {len(o['lines'])} items", order_email_body(o))
+                    for o in orders
+                ], on_sent=record)
+            return {"status": "success", "sent": True, "orders": recorded}
+        except Exception as e:
+            print(f"Restock batch failed: {e}")
+            return {"status": "error", "message": str(e), "orders": recorded}
+
+@app.post("/inventory/restock_batch")
+def run_restock_batch():
+    return restock_batch()
+
+@app.get("/inventory/orders")
+def get_inventory_orders():
+    return inventory_store.list_orders()
+
+@app.post("/inventory/orders/{order_id}/receive")
+def receive_inventory_order(order_id: int):
+    """Book a delivered order: its quantities move from on_order to on_hand."""
+    try:
+        lines = inventory_store.receive_order(order_id)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "received": lines}
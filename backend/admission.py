@@ -0,0 +1,152 @@
+import threading
+import time
+
+# --- Admission Control for Inference Routes ---
+
+
+class RateLimited(Exception):
+    pass
+
+
+class Overloaded(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class _Call:
+    """One in-flight computation that identical requests wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class AdmissionController:
+    """
+    Per-client token buckets, single-flight coalescing and a bounded queue.
+
+    Sync routes run on a shared threadpool, so inference may hold at most
+    max_inflight threads plus max_queue waiting ones (queued leaders and
+    coalesced followers alike); the rest of the pool stays free for routes
+    like /execute_emergency. Requests that would have to queue are shed
+    straight away while the average inference latency is over budget,
+    queued leaders give up after waiting one budget and followers after two
+    (the leader's queue wait plus its run).
+    """
+
+    def __init__(self, rate=5.0, burst=10, max_inflight=4, max_queue=16, latency_budget_ms=250.0, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.latency_budget_ms = latency_budget_ms
+        self.max_clients = max_clients
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_inflight)
+        self.buckets = {}
+        self.calls = {}
+        self.waiting = 0
+        self.latency_ms = 0.0
+        self.stats = {"admitted": 0, "coalesced": 0, "rate_limited": 0, "shed": 0}
+
+    def run(self, client, key, fn):
+        """Run fn() for client, sharing the result with identical in-flight keys."""
+        with self.lock:
+            now = time.monotonic()
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                if len(self.buckets) >= self.max_clients:
+                    # Drop buckets that have refilled completely; they hold no state
+                    self.buckets = {
+                        c: b for c, b in self.buckets.items()
+                        if b.tokens + (now - b.updated) * b.rate < b.burst
+                    }
+                bucket = self.buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if not bucket.take(now):
+                self.stats["rate_limited"] += 1
+                raise RateLimited()
+
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            elif self.waiting >= self.max_queue:
+                # Followers hold a thread too, so they share the queue bound
+                self.stats["shed"] += 1
+                raise Overloaded()
+            else:
+                self.waiting += 1
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            finished = call.done.wait(timeout=2 * self.latency_budget_ms / 1000)
+            with self.lock:
+                self.waiting -= 1
+                if not finished:
+                    self.stats["shed"] += 1
+            if not finished:
+                raise Overloaded()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._admit(fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def _admit(self, fn):
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                if self.waiting >= self.max_queue or self.latency_ms > self.latency_budget_ms:
+                    self.stats["shed"] += 1
+                    raise Overloaded()
+                self.waiting += 1
+            acquired = self.slots.acquire(timeout=self.latency_budget_ms / 1000)
+            with self.lock:
+                self.waiting -= 1
+                if not acquired:
+                    self.stats["shed"] += 1
+            if not acquired:
+                raise Overloaded()
+
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self.slots.release()
+            elapsed = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.stats["admitted"] += 1
+                # Exponentially weighted so one slow call does not trip shedding
+                self.latency_ms = 0.8 * self.latency_ms + 0.2 * elapsed
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                **self.stats,
+                "queued": self.waiting,
+                "latency_ms": round(self.latency_ms, 2),
+                "latency_budget_ms": self.latency_budget_ms
+            }
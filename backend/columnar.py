@@ -0,0 +1,95 @@
+import numpy as np
+import msgpack
+
+# --- Columnar MessagePack Responses ---
+# Clients send "Accept: application/x-msgpack" to get this instead of JSON.
+# Payload: {"length": n, "columns": {name: column}}, where a numeric column is
+# {"dtype": "<f8", "data": <raw little-endian bytes>} that maps straight onto a
+# typed array (e.g. Float64Array in JS), and any other column is a list of strings.
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def _quality(accept, media_types):
+    """Highest q the Accept header gives to any of media_types (0 if none)."""
+    best = 0.0
+    for part in (accept or "").split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        if media_type.lower() not in media_types:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        best = max(best, q)
+    return best
+
+
+def wants_msgpack(accept):
+    """
+    True when the client prefers MessagePack over JSON. Only an explicit
+    application/x-msgpack counts; wildcards keep the JSON default, and a
+    missing Accept header means JSON.
+    """
+    msgpack_q = _quality(accept, {MSGPACK_MEDIA_TYPE})
+    json_q = _quality(accept, {"application/json", "application/*", "*/*"})
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+def encode_column(values):
+    if values.dtype.kind in "biuf":
+        values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<"))
+        return {"dtype": values.dtype.str, "data": memoryview(values).cast("B")}
+    return values.astype(str).tolist()
+
+
+def dataframe_to_msgpack(frame):
+    """Pack a DataFrame column by column, straight from its NumPy buffers."""
+    return msgpack.packb({
+        "length": len(frame),
+        "columns": {str(name): encode_column(frame[name].to_numpy()) for name in frame.columns}
+    })
+
+
+def decode_msgpack(payload):
+    """Inverse of dataframe_to_msgpack as a dict of NumPy arrays (for Python clients)."""
+    body = msgpack.unpackb(payload)
+    return {
+        name: np.frombuffer(col["data"], dtype=col["dtype"]) if isinstance(col, dict) else np.array(col)
+        for name, col in body["columns"].items()
+    }
+
+
+if __name__ == "__main__":
+    # Benchmark: full daily history, JSON records vs columnar MessagePack
+    import json
+    import os
+    import time
+    import pandas as pd
+    from fastapi.encoders import jsonable_encoder
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    history = pd.read_csv(os.path.join(project_root, 'public', 'hospital_daily_1996_2024_indian_holidays.csv'))
+
+    def best_of(fn, runs=20):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            out = fn()
+            times.append((time.perf_counter() - start) * 1000)
+        return min(times), out
+
+    json_ms, json_body = best_of(lambda: json.dumps(history.to_dict(orient='records')).encode())
+    # What a FastAPI route returning the records list actually does
+    route_ms, _ = best_of(lambda: json.dumps(jsonable_encoder(history.to_dict(orient='records'))).encode(), runs=5)
+    packed_ms, packed_body = best_of(lambda: dataframe_to_msgpack(history))
+    decoded = decode_msgpack(packed_body)
+    assert all(np.array_equal(decoded[c], history[c].to_numpy().astype(decoded[c].dtype)) for c in history.columns)
+
+    print(f"{len(history)} rows x {len(history.columns)} columns")
+    print(f"JSON records (route): {route_ms:7.2f} ms  {len(json_body) / 1024:8.1f} KiB")
+    print(f"JSON records:         {json_ms:7.2f} ms  {len(json_body) / 1024:8.1f} KiB")
+    print(f"MessagePack columns:  {packed_ms:7.2f} ms  {len(packed_body) / 1024:8.1f} KiB")
@@ -0,0 +1,219 @@
+import math
+import threading
+import time
+import numpy as np
+
+# --- Hospital Spatial Index ---
+# Grid cells of CELL_DEG x CELL_DEG degrees (~11 km in latitude)
+CELL_DEG = 0.1
+KM_PER_DEG = 111.2
+EARTH_RADIUS_KM = 6371.0
+# Past this many grid cells a ring walk costs more than scanning every hospital
+FULL_SCAN_CELLS = 1500
+
+# Public Hospitals page mock data, with coordinates so the index is never empty
+DEFAULT_HOSPITALS = [
+    {"id": "1", "name": "Apollo Hospitals", "address": "Bandra, Mumbai", "lat": 19.0596, "lon": 72.8295, "beds": 450, "occupancy": 78},
+    {"id": "2", "name": "Lilavati Hospital", "address": "Bandra, Mumbai", "lat": 19.0509, "lon": 72.8294, "beds": 380, "occupancy": 65},
+    {"id": "3", "name": "Hinduja Hospital", "address": "Mahim, Mumbai", "lat": 19.0336, "lon": 72.8385, "beds": 320, "occupancy": 82},
+    {"id": "4", "name": "Breach Candy Hospital", "address": "Kala Ghoda, Mumbai", "lat": 18.9724, "lon": 72.8054, "beds": 280, "occupancy": 71},
+    {"id": "5", "name": "Jaslok Hospital", "address": "Peddar Road, Mumbai", "lat": 18.9713, "lon": 72.8092, "beds": 350, "occupancy": 68},
+    {"id": "6", "name": "Max Healthcare", "address": "Bandra East, Mumbai", "lat": 19.0632, "lon": 72.8490, "beds": 400, "occupancy": 75},
+]
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance from one point to arrays of points."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class HospitalIndex:
+    """
+    Uniform lat/lon grid over hospital coordinates.
+
+    Coordinates and bed counts only change when hospitals are registered, so
+    occupancy refreshes write straight into the occupancy array and never
+    touch the grid. Route handlers share one index across the threadpool, so
+    every public method holds the lock.
+    """
+
+    def __init__(self, hospitals=()):
+        self.ids = []
+        self.info = []
+        self.position = {}
+        self.lat = np.zeros(0)
+        self.lon = np.zeros(0)
+        self.beds = np.zeros(0)
+        self.occupancy = np.zeros(0)
+        self.cells = {}
+        self.lock = threading.Lock()
+        self.add(hospitals)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / CELL_DEG), math.floor(lon / CELL_DEG))
+
+    def __len__(self):
+        with self.lock:
+            return len(self.ids)
+
+    def _validate(self, h):
+        lat, lon, beds = h["lat"], h["lon"], h["beds"]
+        occupancy = h.get("occupancy")
+        if not (math.isfinite(lat) and -90 <= lat <= 90 and math.isfinite(lon) and -180 <= lon <= 180):
+            raise ValueError(f"Hospital {h['id']} has invalid coordinates")
+        if not (math.isfinite(beds) and beds >= 0):
+            raise ValueError(f"Hospital {h['id']} must have a non-negative bed count")
+        if occupancy is not None and not (math.isfinite(occupancy) and 0 <= occupancy <= 100):
+            raise ValueError(f"Hospital {h['id']} occupancy must be between 0 and 100")
+
+    def add(self, hospitals):
+        """
+        Insert new hospitals, or update known ones in place. Every row is
+        checked first, so a bad one leaves the index untouched. A missing
+        occupancy or address keeps a known hospital's current value.
+        """
+        hospitals = list(hospitals)
+        for h in hospitals:
+            self._validate(h)
+        with self.lock:
+            self._add(hospitals)
+
+    def _add(self, hospitals):
+        new = []
+        for h in hospitals:
+            k = self.position.get(h["id"])
+            if k is None:
+                new.append(h)
+                continue
+            # Known hospital: refresh its details (moving it re-files its cell)
+            old_cell = self._cell(self.lat[k], self.lon[k])
+            self.info[k] = {"name": h["name"], "address": h.get("address", self.info[k]["address"])}
+            self.lat[k], self.lon[k], self.beds[k] = h["lat"], h["lon"], h["beds"]
+            if h.get("occupancy") is not None:
+                self.occupancy[k] = h["occupancy"]
+            cell = self._cell(h["lat"], h["lon"])
+            if cell != old_cell:
+                self.cells[old_cell].remove(k)
+                self._file(k, cell)
+        if not new:
+            return
+
+        start = len(self.ids)
+        self.lat = np.append(self.lat, [h["lat"] for h in new])
+        self.lon = np.append(self.lon, [h["lon"] for h in new])
+        self.beds = np.append(self.beds, [h["beds"] for h in new])
+        self.occupancy = np.append(self.occupancy, [h.get("occupancy") or 0.0 for h in new])
+        for k, h in enumerate(new, start):
+            self.ids.append(h["id"])
+            self.info.append({"name": h["name"], "address": h.get("address", "")})
+            self.position[h["id"]] = k
+            self._file(k, self._cell(h["lat"], h["lon"]))
+
+    def _file(self, k, cell):
+        self.cells.setdefault(cell, []).append(k)
+
+    def update_occupancy(self, occupancy):
+        """Set predicted occupancy (%) by hospital id; unknown ids are returned."""
+        unknown = []
+        with self.lock:
+            for hospital_id, value in occupancy.items():
+                k = self.position.get(hospital_id)
+                if k is None:
+                    unknown.append(hospital_id)
+                else:
+                    self.occupancy[k] = value
+        return unknown
+
+    def _ring(self, center, r):
+        ci, cj = center
+        if r == 0:
+            return [center]
+        cells = [(ci + di, cj + dj) for di in (-r, r) for dj in range(-r, r + 1)]
+        cells += [(ci + di, cj + dj) for dj in (-r, r) for di in range(-r + 1, r)]
+        return cells
+
+    def nearby(self, lat, lon, k=5, min_beds=1, max_km=None):
+        """k nearest hospitals with at least min_beds predicted spare beds."""
+        with self.lock:
+            return self._nearby(lat, lon, k, min_beds, max_km)
+
+    def _nearby(self, lat, lon, k, min_beds, max_km):
+        if not self.ids or k < 1:
+            return []
+        center = self._cell(lat, lon)
+
+        found_idx, found_dist = np.zeros(0, dtype=int), np.zeros(0)
+        r = 0
+        while True:
+            # Once the rings would cover more cells than are occupied, or more
+            # than FULL_SCAN_CELLS (far-off queries, or too few hospitals with
+            # spare beds), one vectorized pass over every hospital is cheaper
+            # than walking mostly empty rings
+            if (2 * r + 1) ** 2 > min(len(self.cells), FULL_SCAN_CELLS):
+                found_idx = np.flatnonzero(self.beds * (1 - self.occupancy / 100) >= min_beds)
+                found_dist = haversine_km(lat, lon, self.lat[found_idx], self.lon[found_idx])
+                break
+
+            candidates = [i for cell in self._ring(center, r) for i in self.cells.get(cell, ())]
+            if candidates:
+                idx = np.array(candidates)
+                spare = self.beds[idx] * (1 - self.occupancy[idx] / 100)
+                idx = idx[spare >= min_beds]
+                if len(idx):
+                    dist = haversine_km(lat, lon, self.lat[idx], self.lon[idx])
+                    found_idx = np.concatenate([found_idx, idx])
+                    found_dist = np.concatenate([found_dist, dist])
+
+            # Anything beyond ring r is at least r cells away in lat or lon
+            lat_edge = min(abs(lat) + (r + 1) * CELL_DEG, 89.9)
+            bound_km = r * CELL_DEG * KM_PER_DEG * math.cos(math.radians(lat_edge))
+            if max_km is not None and bound_km > max_km:
+                break
+            if len(found_dist) >= k and np.partition(found_dist, k - 1)[k - 1] <= bound_km:
+                break
+            r += 1
+
+        if max_km is not None:
+            keep = found_dist <= max_km
+            found_idx, found_dist = found_idx[keep], found_dist[keep]
+        order = np.argsort(found_dist)[:k]
+        results = []
+        for i, d in zip(found_idx[order], found_dist[order]):
+            results.append({
+                "id": self.ids[i],
+                **self.info[i],
+                "lat": float(self.lat[i]),
+                "lon": float(self.lon[i]),
+                "beds": int(self.beds[i]),
+                "predicted_occupancy": round(float(self.occupancy[i]), 1),
+                "spare_beds": int(self.beds[i] * (1 - self.occupancy[i] / 100)),
+                "distance_km": round(float(d), 2)
+            })
+        return results
+
+
+if __name__ == "__main__":
+    # Benchmark: tens of thousands of facilities spread over India
+    rng = np.random.default_rng(0)
+    for n in (10_000, 50_000):
+        index = HospitalIndex([
+            {"id": str(k), "name": f"Hospital {k}", "lat": lat, "lon": lon,
+             "beds": int(beds), "occupancy": occ}
+            for k, (lat, lon, beds, occ) in enumerate(zip(
+                rng.uniform(8, 35, n), rng.uniform(68, 97, n),
+                rng.integers(20, 800, n), rng.uniform(40, 100, n)))
+        ])
+        queries = zip(rng.uniform(8, 35, 1000), rng.uniform(68, 97, 1000))
+        times = []
+        for lat, lon in queries:
+            start = time.perf_counter()
+            index.nearby(lat, lon, k=5, min_beds=10)
+            times.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        index.update_occupancy({str(k): 90.0 for k in range(0, n, 10)})
+        refresh_ms = (time.perf_counter() - start) * 1000
+        print(f"{n} hospitals: mean {np.mean(times):.3f} ms, p99 {np.percentile(times, 99):.3f} ms, "
+              f"refresh {n // 10} occupancies {refresh_ms:.1f} ms")
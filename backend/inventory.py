@@ -0,0 +1,238 @@
+import json
+import math
+import sqlite3
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# --- Inventory Depletion & Restock Batching ---
+# Thresholds match the reasoning engine in predict()
+HEATWAVE_TEMP = 38
+HIGH_AQI = 200
+# ~95% service level for safety stock
+SERVICE_Z = 1.65
+# Days of demand each order should cover beyond the reorder point
+REVIEW_DAYS = 7
+# Scheduled batches skip a forecast that started more than this many days ago
+MAX_FORECAST_AGE_DAYS = 1
+
+ITEM_COLUMNS = [
+    "sku", "name", "category", "vendor", "vendor_email", "on_hand", "on_order",
+    "per_100_patients", "heat_factor", "smog_factor", "lead_time_days", "pack_size"
+]
+
+# Fields without a sensible default, required when a SKU is first added
+NEW_ITEM_FIELDS = ["name", "vendor", "vendor_email", "per_100_patients", "lead_time_days"]
+
+# Starting catalog: the ResourcesView items plus what predict() tells staff to stock.
+# per_100_patients is daily usage; heat/smog factors multiply it on heatwave/high-AQI days.
+DEFAULT_ITEMS = [
+    ("OXY-CYL", "Oxygen Cylinders", "Medical", "AirLiquide", "orders@airliquide.example", 120, 0, 5, 1.0, 1.8, 2, 10),
+    ("PPE-KIT", "PPE Kits", "General", "SafetyFirst", "orders@safetyfirst.example", 300, 0, 15, 1.0, 1.0, 3, 50),
+    ("IV-NS", "IV Fluids (NS)", "Pharma", "PharmaCorp", "orders@pharmacorp.example", 400, 0, 8, 2.5, 1.0, 2, 24),
+    ("MASK-SURG", "Surgical Masks", "Surgical", "SafetyFirst", "orders@safetyfirst.example", 1500, 0, 20, 1.0, 1.5, 3, 100),
+    ("PCM-500", "Paracetamol 500mg", "Pharma", "PharmaCorp", "orders@pharmacorp.example", 2000, 0, 2, 1.5, 1.0, 2, 100),
+    ("SYR-5ML", "Syringes 5ml", "Surgical", "MediEquip", "orders@mediequip.example", 500, 0, 12, 1.2, 1.0, 4, 100),
+    ("BANDAGE", "Bandages", "General", "MediEquip", "orders@mediequip.example", 600, 0, 5, 1.0, 1.0, 4, 50),
+    ("NEB-KIT", "Nebulizer Kits", "Medical", "MediEquip", "orders@mediequip.example", 80, 0, 3, 1.0, 3.0, 4, 10),
+    ("COOL-PACK", "Cooling Packs", "General", "PharmaCorp", "orders@pharmacorp.example", 150, 0, 4, 4.0, 1.0, 2, 20),
+]
+
+
+class InventoryStore:
+    """SQLite-backed stock levels, open orders and the latest patient forecast."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    sku TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT NOT NULL DEFAULT 'General',
+                    vendor TEXT NOT NULL, vendor_email TEXT NOT NULL,
+                    on_hand REAL NOT NULL DEFAULT 0 CHECK (on_hand >= 0),
+                    on_order REAL NOT NULL DEFAULT 0 CHECK (on_order >= 0),
+                    per_100_patients REAL NOT NULL CHECK (per_100_patients >= 0),
+                    heat_factor REAL NOT NULL DEFAULT 1 CHECK (heat_factor >= 0),
+                    smog_factor REAL NOT NULL DEFAULT 1 CHECK (smog_factor >= 0),
+                    lead_time_days INTEGER NOT NULL CHECK (lead_time_days >= 0),
+                    pack_size INTEGER NOT NULL DEFAULT 1 CHECK (pack_size >= 1)
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS orders (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT,
+                    vendor TEXT, vendor_email TEXT, lines TEXT, status TEXT
+                )""")
+            # Forecasts saved before rows were dated cannot be aged; drop them
+            if conn.execute("SELECT COUNT(*) FROM pragma_table_info('forecast') WHERE name = 'date'").fetchone()[0] == 0:
+                conn.execute("DROP TABLE IF EXISTS forecast")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS forecast (
+                    day INTEGER PRIMARY KEY, date TEXT NOT NULL,
+                    patients REAL NOT NULL CHECK (patients >= 0), aqi REAL NOT NULL CHECK (aqi >= 0), temp REAL NOT NULL
+                )""")
+            if conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0:
+                conn.executemany(f"INSERT INTO items VALUES ({', '.join('?' * len(ITEM_COLUMNS))})", DEFAULT_ITEMS)
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def items(self):
+        with self._connect() as conn:
+            return pd.read_sql_query("SELECT * FROM items ORDER BY sku", conn)
+
+    def upsert_items(self, rows):
+        """
+        Insert new SKUs or update any given fields of existing ones, in one
+        transaction. A new SKU must carry every field in NEW_ITEM_FIELDS;
+        the rest fall back to the column defaults.
+        """
+        with self._connect() as conn:
+            known = {r[0] for r in conn.execute("SELECT sku FROM items")}
+            for row in rows:
+                fields = [c for c in ITEM_COLUMNS if c in row and row[c] is not None]
+                if row["sku"] in known:
+                    updates = [c for c in fields if c != "sku"]
+                    if updates:
+                        conn.execute(
+                            f"UPDATE items SET {', '.join(f'{c} = ?' for c in updates)} WHERE sku = ?",
+                            [row[c] for c in updates] + [row["sku"]]
+                        )
+                    continue
+                missing = [c for c in NEW_ITEM_FIELDS if c not in fields]
+                if missing:
+                    raise ValueError(f"New SKU {row['sku']} is missing: {', '.join(missing)}")
+                conn.execute(
+                    f"INSERT INTO items ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                    [row[c] for c in fields]
+                )
+                known.add(row["sku"])
+
+    def save_forecast(self, days, start):
+        """Replace the forecast with days starting on start (a date)."""
+        for day in days:
+            values = [day["predicted_patients"], day["aqi"], day["temp"]]
+            if not all(math.isfinite(v) for v in values) or min(values[:2]) < 0:
+                raise ValueError("Forecast patients and AQI must be finite and non-negative, temp finite")
+        with self._connect() as conn:
+            conn.execute("DELETE FROM forecast")
+            conn.executemany(
+                "INSERT INTO forecast VALUES (?, ?, ?, ?, ?)",
+                [(d, (start + timedelta(days=d)).isoformat(), day["predicted_patients"], day["aqi"], day["temp"])
+                 for d, day in enumerate(days)]
+            )
+
+    def load_forecast(self):
+        with self._connect() as conn:
+            return pd.read_sql_query("SELECT * FROM forecast ORDER BY day", conn)
+
+    def record_orders(self, orders):
+        """Store sent vendor orders and move their quantities to on_order."""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO orders (created_at, vendor, vendor_email, lines, status) VALUES (?, ?, ?, ?, 'sent')",
+                [(now, o["vendor"], o["vendor_email"], json.dumps(o["lines"])) for o in orders]
+            )
+            conn.executemany(
+                "UPDATE items SET on_order = on_order + ? WHERE sku = ?",
+                [(line["quantity"], line["sku"]) for o in orders for line in o["lines"]]
+            )
+
+    def receive_order(self, order_id):
+        """Move a sent order's quantities from on_order into on_hand."""
+        with self._connect() as conn:
+            # Flip the status first so two receipts of one order cannot both apply
+            if conn.execute("UPDATE orders SET status = 'received' WHERE id = ? AND status = 'sent'", (order_id,)).rowcount == 0:
+                row = conn.execute("SELECT status FROM orders WHERE id = ?", (order_id,)).fetchone()
+                raise ValueError(f"Unknown order {order_id}" if row is None else f"Order {order_id} is already {row[0]}")
+            lines = json.loads(conn.execute("SELECT lines FROM orders WHERE id = ?", (order_id,)).fetchone()[0])
+            conn.executemany(
+                "UPDATE items SET on_hand = on_hand + ?, on_order = MAX(on_order - ?, 0) WHERE sku = ?",
+                [(line["quantity"], line["quantity"], line["sku"]) for line in lines]
+            )
+        return lines
+
+    def list_orders(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, created_at, vendor, vendor_email, lines, status FROM orders ORDER BY id DESC").fetchall()
+        return [
+            {"id": r[0], "created_at": r[1], "vendor": r[2], "vendor_email": r[3], "lines": json.loads(r[4]), "status": r[5]}
+            for r in rows
+        ]
+
+
+def forecast_is_stale(forecast, today=None):
+    """True when the stored forecast started more than MAX_FORECAST_AGE_DAYS ago."""
+    start = date.fromisoformat(forecast["date"].iloc[0])
+    return ((today or date.today()) - start).days > MAX_FORECAST_AGE_DAYS
+
+
+def project_usage(items, forecast):
+    """Daily usage per item over the forecast horizon, shape (days, items)."""
+    patients = forecast["patients"].to_numpy(dtype=float)[:, None]
+    heat = (forecast["temp"].to_numpy() > HEATWAVE_TEMP)[:, None]
+    smog = (forecast["aqi"].to_numpy() > HIGH_AQI)[:, None]
+    rate = items["per_100_patients"].to_numpy(dtype=float)[None, :]
+    heat_factor = np.where(heat, items["heat_factor"].to_numpy(dtype=float)[None, :], 1.0)
+    smog_factor = np.where(smog, items["smog_factor"].to_numpy(dtype=float)[None, :], 1.0)
+    return patients / 100 * rate * heat_factor * smog_factor
+
+
+def reorder_plan(items, usage):
+    """
+    Reorder points and order quantities for every item in one pass.
+
+    Reorder point is forecast demand over the item's lead time plus safety
+    stock; items whose stock position falls to it are ordered back up to
+    that point plus REVIEW_DAYS of average demand, rounded up to pack size.
+    """
+    days = usage.shape[0]
+    lead = items["lead_time_days"].to_numpy(dtype=int)
+    cumulative = np.vstack([np.zeros(usage.shape[1]), usage.cumsum(axis=0)])
+    # Past the horizon, assume the last day's rate continues
+    within = np.minimum(lead, days)
+    lead_demand = cumulative[within, np.arange(usage.shape[1])] + (lead - within) * usage[-1]
+
+    daily_mean = usage.mean(axis=0)
+    safety = SERVICE_Z * usage.std(axis=0) * np.sqrt(lead)
+    reorder_point = lead_demand + safety
+    position = items["on_hand"].to_numpy(dtype=float) + items["on_order"].to_numpy(dtype=float)
+    pack = items["pack_size"].to_numpy(dtype=float)
+    shortfall = np.maximum(reorder_point + REVIEW_DAYS * daily_mean - position, 0)
+
+    plan = items[["sku", "name", "vendor", "vendor_email", "on_hand", "on_order"]].copy()
+    plan["days_of_cover"] = np.divide(items["on_hand"].to_numpy(dtype=float), daily_mean,
+                                      out=np.full(len(items), np.inf), where=daily_mean > 0).round(1)
+    plan["reorder_point"] = np.ceil(reorder_point)
+    plan["due"] = position <= reorder_point
+    plan["order_quantity"] = np.where(plan["due"], np.ceil(shortfall / pack) * pack, 0).astype(int)
+    return plan
+
+
+def batch_orders(plan):
+    """Coalesce every due item into one order per vendor."""
+    due = plan[plan["due"] & (plan["order_quantity"] > 0)]
+    orders = []
+    for (vendor, vendor_email), group in due.groupby(["vendor", "vendor_email"], sort=True):
+        orders.append({
+            "vendor": vendor,
+            "vendor_email": vendor_email,
+            "lines": [
+                {"sku": sku, "name": name, "quantity": int(qty)}
+                for sku, name, qty in zip(group["sku"], group["name"], group["order_quantity"])
+            ]
+        })
+    return orders
+
+
+def order_email_body(order):
+    lines = "\n".join(f"- {line['name']} ({line['sku']}): {line['quantity']} units" for line in order["lines"])
+    return f"Please supply the following to HealthSurge Hospital:\n{lines}"
+
+
+def records(plan):
+    """JSON-safe rows for the API (unused items have no days of cover)."""
+    out = plan.astype(object)
+    if "days_of_cover" in plan:
+        out["days_of_cover"] = [None if math.isinf(v) else v for v in plan["days_of_cover"]]
+    return out.to_dict(orient="records")